@@ -3,10 +3,24 @@ import os
 from datetime import datetime
 
 
+# столбцы, без которых файл нельзя подключить как библиотеку
+REQUIRED_COLUMNS = {
+    'genres': {'id', 'name'},
+    'movies': {'id', 'title', 'year', 'genre_id', 'director', 'rating',
+               'description', 'poster_path', 'is_watched', 'created_at'},
+}
+
+
 class DatabaseManager:
     def __init__(self, db_path="movies.db"):
         self.db_path = db_path
         self.connection = None
+        # библиотеки: имя -> схема sqlite, основная база всегда подключена как main
+        self.main_library = os.path.splitext(os.path.basename(db_path))[0]
+        self.libraries = {self.main_library: 'main'}
+        # кэш справочных данных, сбрасывается при изменениях
+        self._genres_cache = None
+        self._directors_cache = None
 
     def connect(self):
         if self.connection is None:
@@ -18,17 +32,46 @@ class DatabaseManager:
         conn = self.connect()
         cursor = conn.cursor()
 
-        # создает таблицу жанров
+        # для новой базы включает постепенное освобождение страниц (см. maintenance.py)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+        self._create_tables(cursor)
+
+        # создает таблицу подключенных библиотек
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS genres (
+            CREATE TABLE IF NOT EXISTS libraries (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            )
+        ''')
+
+        # если таблица пуста, добавляет стандартные жанры
+        self._create_default_genres(cursor)
+        conn.commit()
+
+        # подключает ранее зарегистрированные библиотеки
+        cursor.execute("SELECT name, path FROM libraries ORDER BY name")
+        for row in cursor.fetchall():
+            if not os.path.exists(row['path']):
+                print(f"Библиотека \"{row['name']}\" не подключена: файл не найден {row['path']}")
+                continue
+            try:
+                self._attach_library(row['name'], row['path'])
+            except (ValueError, sqlite3.Error) as e:
+                print(f"Библиотека \"{row['name']}\" не подключена: {e}")
+
+    def _create_tables(self, cursor, schema='main'):
+        # создает таблицу жанров
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.genres (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE
             )
         ''')
 
         # создает таблицу фильмов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.movies (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT NOT NULL,
                 year INTEGER NOT NULL,
@@ -43,10 +86,6 @@ class DatabaseManager:
             )
         ''')
 
-        # если таблица пуста, добавляет стандартные жанры
-        self._create_default_genres(cursor)
-        conn.commit()
-
     def _create_default_genres(self, cursor):
         genres = ['Драма', 'Комедия', 'Боевик', 'Триллер', 'Ужасы',
                   'Фантастика', 'Фэнтези', 'Мелодрама', 'Приключения',
@@ -58,22 +97,154 @@ class DatabaseManager:
             for genre in genres:
                 cursor.execute('INSERT INTO genres (name) VALUES (?)', (genre,))
 
-    def add_movie(self, title, year, genre_id, director=None, rating=None, description=None, poster_path=None):
+    def _library_names(self):
+        # имена подключенных и зарегистрированных библиотек
+        cursor = self.connect().cursor()
+        cursor.execute("SELECT name FROM libraries")
+        return set(self.libraries) | {row['name'] for row in cursor.fetchall()}
+
+    def suggest_library_name(self, path):
+        # все коллекции этого приложения называются movies.db, поэтому при совпадении
+        # имени используется папка файла, а затем числовой суффикс
+        path = os.path.abspath(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        folder = os.path.basename(os.path.dirname(path))
+        taken = self._library_names()
+
+        for candidate in (stem, folder):
+            if candidate and candidate not in taken:
+                return candidate
+        number = 2
+        while f"{stem}_{number}" in taken:
+            number += 1
+        return f"{stem}_{number}"
+
+    def add_library(self, path, name=None):
+        # регистрирует файл библиотеки и подключает его через ATTACH
+        path = os.path.abspath(path)
+        for lib in self.get_libraries():
+            if lib['path'] and os.path.normcase(lib['path']) == os.path.normcase(path):
+                raise ValueError(f"Файл уже зарегистрирован как библиотека \"{lib['name']}\"")
+
+        name = name or self.suggest_library_name(path)
+        if name in self._library_names():
+            raise ValueError(f"Библиотека \"{name}\" уже подключена")
+
+        self._attach_library(name, path)
+        conn = self.connect()
+        conn.execute("INSERT OR REPLACE INTO libraries (name, path) VALUES (?, ?)", (name, path))
+        conn.commit()
+        return name
+
+    def _attach_library(self, name, path):
+        conn = self.connect()
+        schema = f"lib_{len(self.libraries)}"
+        while schema in self.libraries.values():
+            schema += "_"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+
+        try:
+            cursor = conn.cursor()
+            self._check_library_schema(cursor, schema)
+            # для нового файла библиотеки включает постепенное освобождение страниц
+            cursor.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+            self._create_tables(cursor, schema)
+            # жанры объединяются по названию: общий справочник хранится в основной базе
+            cursor.execute(f'''
+                INSERT INTO main.genres (name)
+                SELECT name FROM {schema}.genres WHERE name NOT IN (SELECT name FROM main.genres)
+            ''')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.execute(f"DETACH DATABASE {schema}")
+            raise
+        self.libraries[name] = schema
+        self.invalidate_cache()
+
+    def _check_library_schema(self, cursor, schema):
+        # CREATE TABLE IF NOT EXISTS не трогает существующие таблицы с другими столбцами,
+        # поэтому уже созданные таблицы проверяются до него
+        for table, required in REQUIRED_COLUMNS.items():
+            cursor.execute(f"PRAGMA {schema}.table_info({table})")
+            columns = {row['name'] for row in cursor.fetchall()}
+            missing = required - columns
+            if columns and missing:
+                raise ValueError(f"В таблице {table} нет столбцов: {', '.join(sorted(missing))}")
+
+    def remove_library(self, name):
+        # отключает библиотеку, файл при этом не удаляется; удаляет и записи
+        # о библиотеках, которые не удалось подключить при запуске
+        if name == self.main_library:
+            return False
+        conn = self.connect()
+        if name in self.libraries:
+            conn.execute(f"DETACH DATABASE {self.libraries.pop(name)}")
+            self.invalidate_cache()
+        cursor = conn.execute("DELETE FROM libraries WHERE name = ?", (name,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    def get_libraries(self):
+        # возвращает список библиотек: сначала подключенные (основная - первая),
+        # затем зарегистрированные, но не подключенные (attached=False)
         conn = self.connect()
         cursor = conn.cursor()
+        cursor.execute("SELECT name, path FROM libraries ORDER BY name")
+        paths = {row['name']: row['path'] for row in cursor.fetchall()}
+        paths[self.main_library] = os.path.abspath(self.db_path)
+
+        libraries = [{'name': name, 'path': paths.get(name), 'attached': True} for name in self.libraries]
+        libraries += [{'name': name, 'path': path, 'attached': False}
+                      for name, path in paths.items() if name not in self.libraries]
+        return libraries
+
+    def _schema(self, library):
+        # возвращает схему библиотеки, по умолчанию - основная
+        if library is None:
+            return 'main'
+        if library not in self.libraries:
+            raise ValueError(f"Неизвестная библиотека: {library}")
+        return self.libraries[library]
+
+    def _library_genre_id(self, cursor, schema, genre_id):
+        # переводит общий ID жанра в ID жанра внутри библиотеки
+        if schema == 'main' or not genre_id:
+            return genre_id
+        cursor.execute(f'''
+            INSERT INTO {schema}.genres (name)
+            SELECT name FROM main.genres
+            WHERE id = ? AND name NOT IN (SELECT name FROM {schema}.genres)
+        ''', (genre_id,))
+        cursor.execute(f'''
+            SELECT lg.id FROM {schema}.genres lg
+            JOIN main.genres g ON g.name = lg.name
+            WHERE g.id = ?
+        ''', (genre_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
 
-        cursor.execute('''
-            INSERT INTO movies (title, year, genre_id, director, rating, description, poster_path)
+    def add_movie(self, title, year, genre_id, director=None, rating=None, description=None, poster_path=None,
+                  library=None):
+        conn = self.connect()
+        cursor = conn.cursor()
+        schema = self._schema(library)
+        genre_id = self._library_genre_id(cursor, schema, genre_id)
+
+        cursor.execute(f'''
+            INSERT INTO {schema}.movies (title, year, genre_id, director, rating, description, poster_path)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (title, year, genre_id, director, rating, description, poster_path))
 
         conn.commit()
+        self._directors_cache = None
         return cursor.lastrowid
 
-    def update_movie(self, movie_id, **kwargs):
+    def update_movie(self, movie_id, library=None, **kwargs):
 
         conn = self.connect()
         cursor = conn.cursor()
+        schema = self._schema(library)
 
         updates = []
         params = []
@@ -81,6 +252,8 @@ class DatabaseManager:
         # формирует список полей, которым нужны обновления
         for field, value in kwargs.items():
             if value is not None:
+                if field == 'genre_id':
+                    value = self._library_genre_id(cursor, schema, value)
                 updates.append(f"{field} = ?")
                 params.append(value)
 
@@ -88,116 +261,167 @@ class DatabaseManager:
             return False
 
         params.append(movie_id)
-        query = f"UPDATE movies SET {', '.join(updates)} WHERE id = ?"
+        query = f"UPDATE {schema}.movies SET {', '.join(updates)} WHERE id = ?"
 
         cursor.execute(query, params)
         conn.commit()
+        if 'director' in kwargs:
+            self._directors_cache = None
         return cursor.rowcount > 0
 
-    def delete_movie(self, movie_id):
+    def delete_movie(self, movie_id, library=None):
         # удаляет фильм по ID
         conn = self.connect()
         cursor = conn.cursor()
+        schema = self._schema(library)
 
         # получает данные фильма
-        movie = self.get_movie(movie_id)
+        movie = self.get_movie(movie_id, library)
         if movie and movie['poster_path'] and os.path.exists(movie['poster_path']):
             try:
                 os.remove(movie['poster_path'])  # удаляет файл постера
             except:
                 pass
 
-        cursor.execute("DELETE FROM movies WHERE id = ?", (movie_id,))
+        cursor.execute(f"DELETE FROM {schema}.movies WHERE id = ?", (movie_id,))
         conn.commit()
+        self._directors_cache = None
         return cursor.rowcount > 0
 
+    def _movies_query(self, schema):
+        # запрос фильмов одной библиотеки с общими ID жанров
+        return f'''
+            SELECT m.id, m.title, m.year, g.id as genre_id, m.director, m.rating,
+                   m.description, m.poster_path, m.is_watched, m.created_at,
+                   g.name as genre_name, ? as library
+            FROM {schema}.movies m
+            LEFT JOIN {schema}.genres lg ON m.genre_id = lg.id
+            LEFT JOIN main.genres g ON g.name = lg.name
+            WHERE 1=1
+        '''
+
     def get_movies(self, filters=None):
-        # получает список фильмов с фильтрами
+        # получает список фильмов со всех библиотек с фильтрами
         conn = self.connect()
         cursor = conn.cursor()
 
-        query = '''
-            SELECT m.*, g.name as genre_name
-            FROM movies m
-            LEFT JOIN genres g ON m.genre_id = g.id
-            WHERE 1=1
-        '''
-        params = []
+        conditions = ''
+        filter_params = []
 
         if filters:
             if filters.get('genre_id'):
-                query += " AND m.genre_id = ?"
-                params.append(filters['genre_id'])
+                conditions += " AND g.id = ?"
+                filter_params.append(filters['genre_id'])
 
             if filters.get('year_from'):
-                query += " AND m.year >= ?"
-                params.append(filters['year_from'])
+                conditions += " AND m.year >= ?"
+                filter_params.append(filters['year_from'])
 
             if filters.get('year_to'):
-                query += " AND m.year <= ?"
-                params.append(filters['year_to'])
+                conditions += " AND m.year <= ?"
+                filter_params.append(filters['year_to'])
 
             if filters.get('is_watched') is not None:
-                query += " AND m.is_watched = ?"
-                params.append(filters['is_watched'])
+                conditions += " AND m.is_watched = ?"
+                filter_params.append(filters['is_watched'])
 
             if filters.get('search'):
                 search_term = f"%{filters['search']}%"
-                query += " AND (m.title LIKE ? OR m.director LIKE ?)"
-                params.extend([search_term, search_term])
+                conditions += " AND (m.title LIKE ? OR m.director LIKE ?)"
+                filter_params.extend([search_term, search_term])
 
-        query += " ORDER BY m.title"
+        # объединяет библиотеки через UNION ALL, сортировка выполняется в sqlite
+        queries = []
+        params = []
+        for name, schema in self.libraries.items():
+            queries.append(self._movies_query(schema) + conditions)
+            params.append(name)
+            params.extend(filter_params)
+
+        query = " UNION ALL ".join(queries) + " ORDER BY title"
         cursor.execute(query, params)
         return [dict(row) for row in cursor.fetchall()]
 
-    def get_movie(self, movie_id):
+    def get_movie(self, movie_id, library=None):
         # получает один фильм по ID
         conn = self.connect()
         cursor = conn.cursor()
+        schema = self._schema(library)
 
-        cursor.execute('''
-            SELECT m.*, g.name as genre_name
-            FROM movies m
-            LEFT JOIN genres g ON m.genre_id = g.id
-            WHERE m.id = ?
-        ''', (movie_id,))
+        cursor.execute(self._movies_query(schema) + " AND m.id = ?",
+                       (library or self.main_library, movie_id))
 
         row = cursor.fetchone()
         return dict(row) if row else None
 
     def get_genres(self):
-        # получает список жанров
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM genres ORDER BY name")
-        return [dict(row) for row in cursor.fetchall()]
+        # получает общий список жанров, повторные вызовы берут его из кэша
+        if self._genres_cache is None:
+            conn = self.connect()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM main.genres ORDER BY name")
+            self._genres_cache = [dict(row) for row in cursor.fetchall()]
+        return self._genres_cache
+
+    def get_directors(self):
+        # получает список режиссеров из всех библиотек для автодополнения
+        if self._directors_cache is None:
+            conn = self.connect()
+            cursor = conn.cursor()
+
+            queries = [f"SELECT director FROM {schema}.movies WHERE director IS NOT NULL"
+                       for schema in self.libraries.values()]
+            cursor.execute(" UNION ".join(queries) + " ORDER BY director")
+            self._directors_cache = [row['director'] for row in cursor.fetchall()]
+        return self._directors_cache
+
+    def invalidate_cache(self):
+        # сбрасывает кэш справочных данных
+        self._genres_cache = None
+        self._directors_cache = None
 
     def get_statistics(self):
-        # получает статистику
+        # получает статистику по всем библиотекам
         conn = self.connect()
         cursor = conn.cursor()
 
+        queries = []
+        params = []
+        for name, schema in self.libraries.items():
+            queries.append(f'''
+                SELECT m.is_watched, m.rating, lg.name as genre_name, ? as library
+                FROM {schema}.movies m
+                LEFT JOIN {schema}.genres lg ON m.genre_id = lg.id
+            ''')
+            params.append(name)
+        all_movies = " UNION ALL ".join(queries)
+
         # основная статистика
-        cursor.execute('''
-            SELECT 
+        cursor.execute(f'''
+            SELECT
                 COUNT(*) as total_movies,
                 COUNT(CASE WHEN is_watched THEN 1 END) as watched_movies,
                 AVG(rating) as avg_rating
-            FROM movies
-        ''')
+            FROM ({all_movies})
+        ''', params)
         stats = dict(cursor.fetchone())
 
         # распределение по жанрам
-        cursor.execute('''
-            SELECT g.name, COUNT(m.id) as count
-            FROM genres g
-            LEFT JOIN movies m ON g.id = m.genre_id
+        cursor.execute(f'''
+            SELECT g.name, COUNT(u.genre_name) as count
+            FROM main.genres g
+            LEFT JOIN ({all_movies}) u ON u.genre_name = g.name
             GROUP BY g.id, g.name
             ORDER BY count DESC
-        ''')
+        ''', params)
         stats['genres'] = [dict(row) for row in cursor.fetchall()]
 
+        # распределение по библиотекам
+        cursor.execute(f"SELECT library, COUNT(*) as count FROM ({all_movies}) GROUP BY library", params)
+        counts = {row['library']: row['count'] for row in cursor.fetchall()}
+        stats['libraries'] = [{'name': name, 'count': counts.get(name, 0)} for name in self.libraries]
+
         return stats
 
     def close(self):
@@ -1,22 +1,64 @@
 import os
+import sqlite3
 from datetime import datetime
-from PyQt6.QtWidgets import (QMainWindow, QMessageBox, QMenu, QFileDialog)
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QMessageBox, QMenu, QFileDialog, QInputDialog)
 from PyQt6.QtGui import QAction, QKeySequence
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QEvent, QThread, QTimer, pyqtSignal
 from PyQt6.uic import loadUiType
 
+from maintenance import MaintenanceManager
 from models import MoviesTableModel
 from movie_dialog import MovieDialog
 
 UI_PATH = os.path.join(os.path.dirname(__file__), 'main_window.ui')
 Ui_MainWindow, _ = loadUiType(UI_PATH)
 
+MAINTENANCE_IDLE_MS = 5 * 60 * 1000  # обслуживание после 5 минут бездействия
+# события ввода, которые считаются активностью пользователя
+USER_INPUT_EVENTS = (QEvent.Type.KeyPress, QEvent.Type.MouseButtonPress,
+                     QEvent.Type.MouseMove, QEvent.Type.Wheel)
+
+
+class MaintenanceWorker(QThread):
+    completed = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_paths, parent=None):
+        super().__init__(parent)
+        self.db_paths = db_paths  # основная база и все подключенные библиотеки
+
+    def run(self):
+        results = []
+        errors = []
+        for db_path in self.db_paths:
+            # соединение создается внутри потока, так как sqlite3 не разрешает
+            # использовать его из другого потока
+            manager = MaintenanceManager(db_path)
+            try:
+                results.extend(manager.run())
+            except Exception as e:
+                errors.append(f"{db_path}: {e}")
+            finally:
+                manager.close()
+
+        if results:
+            self.completed.emit(results)
+        if errors:
+            self.failed.emit("\n".join(errors))
+
 
 class MainWindow(QMainWindow, Ui_MainWindow):
     def __init__(self, db_manager):
         super().__init__()
         self.db_manager = db_manager
         self.movies_model = MoviesTableModel()  # модель данных
+        self.maintenance_worker = None
+        self.movie_dialog = None  # создается один раз и переиспользуется
+
+        # таймер бездействия, по которому запускается обслуживание базы
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.setSingleShot(True)
+        self.maintenance_timer.setInterval(MAINTENANCE_IDLE_MS)
 
         self.setupUi(self)
         self.setup_connections()
@@ -27,6 +69,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.editMovieBtn.clicked.connect(self.edit_selected_movie)
         self.deleteMovieBtn.clicked.connect(self.delete_selected_movie)
         self.refreshBtn.clicked.connect(self.refresh_data)
+        self.addLibraryBtn.clicked.connect(self.add_library)
+        self.removeLibraryBtn.clicked.connect(self.remove_library)
 
         self.searchEdit.textChanged.connect(self.on_filters_changed)
         self.genreCombo.currentIndexChanged.connect(self.on_filters_changed)
@@ -37,6 +81,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.tabWidget.currentChanged.connect(self.on_tab_changed)
         self.moviesTable.doubleClicked.connect(self.edit_selected_movie)
         self.moviesTable.customContextMenuRequested.connect(self.show_context_menu)
+        self.maintenance_timer.timeout.connect(self.run_maintenance)
+
+        # любой ввод пользователя в приложении откладывает обслуживание
+        QApplication.instance().installEventFilter(self)
+        self.maintenance_timer.start()
 
         # горячие клавиши
         add_action = QAction(self)
@@ -92,13 +141,27 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # первичная загрузка фильмов
         self.refresh_data()
 
-    # получаает список жанров из базы данных
+    # получаает список жанров из кэша, сохраняя выбранный жанр
     def load_genres(self):
         genres = self.db_manager.get_genres()
+        current_id = self.genreCombo.currentData()
+        self.genreCombo.blockSignals(True)
         self.genreCombo.clear()
         self.genreCombo.addItem("Все жанры", 0)
+        genre_indexes = {}
         for genre in genres:
+            genre_indexes[genre['id']] = self.genreCombo.count()
             self.genreCombo.addItem(genre['name'], genre['id'])
+        self.genreCombo.setCurrentIndex(genre_indexes.get(current_id, 0))
+        self.genreCombo.blockSignals(False)
+
+    def get_movie_dialog(self, movie=None, library=None):
+        # возвращает общий диалог фильма, заполненный для добавления или редактирования
+        if self.movie_dialog is None:
+            self.movie_dialog = MovieDialog(self.db_manager, self, movie, library)
+        else:
+            self.movie_dialog.reset(movie, library)
+        return self.movie_dialog
 
     # обновляет список фильмов по фильтрам
     def refresh_data(self):
@@ -155,6 +218,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             # статистика
             genre_stats = "\n".join([f"• {g['name']}: {g['count']} фильмов" for g in stats['genres'] if g['count'] > 0])
+            library_stats = "\n".join([f"• {lib['name']}: {lib['count']} фильмов" for lib in stats['libraries']])
             stats_text = f"""СТАТИСТИКА КОЛЛЕКЦИИ
 
             Всего фильмов: {stats['total_movies']}
@@ -162,7 +226,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             Средний рейтинг: {stats['avg_rating'] or 0:.1f}
 
             РАСПРЕДЕЛЕНИЕ ПО ЖАНРАМ:
-            {genre_stats}"""
+            {genre_stats}
+
+            РАСПРЕДЕЛЕНИЕ ПО БИБЛИОТЕКАМ:
+            {library_stats}"""
 
             self.statsText.setPlainText(stats_text)
 
@@ -170,7 +237,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             print(f"Ошибка статистики: {e}")
 
     def add_movie(self):
-        dialog = MovieDialog(self.db_manager, self)
+        # по умолчанию новый фильм добавляется в библиотеку выбранной строки
+        library = None
+        selection = self.moviesTable.selectionModel().selectedRows()
+        if selection:
+            library = self.movies_model.get_movie(selection[0].row()).get('library')
+
+        dialog = self.get_movie_dialog(library=library)
         if dialog.exec() == MovieDialog.DialogCode.Accepted:
             self.refresh_data()
             QMessageBox.information(self, "Успех", "Фильм добавлен!")
@@ -183,11 +256,62 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         movie = self.movies_model.get_movie(selection[0].row())
         if movie:
-            dialog = MovieDialog(self.db_manager, self, movie)
+            dialog = self.get_movie_dialog(movie)
             if dialog.exec() == MovieDialog.DialogCode.Accepted:
                 self.refresh_data()
                 QMessageBox.information(self, "Успех", "Фильм обновлен!")
 
+    def add_library(self):
+        # подключает файл другой коллекции (дом, работа, архив)
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите библиотеку", "", "SQLite (*.db *.sqlite)"
+        )
+        if not file_path:
+            return
+
+        # имя предлагается автоматически, но его можно изменить
+        name, ok = QInputDialog.getText(
+            self, "Подключить библиотеку", "Название библиотеки:",
+            text=self.db_manager.suggest_library_name(file_path)
+        )
+        if not ok:
+            return
+
+        try:
+            name = self.db_manager.add_library(file_path, name.strip() or None)
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось подключить библиотеку: {str(e)}")
+            return
+
+        self.load_genres()
+        self.refresh_data()
+        QMessageBox.information(self, "Успех", f"Библиотека \"{name}\" подключена!")
+
+    def remove_library(self):
+        # отключает одну из дополнительных библиотек, файл остается на диске
+        # неподключенные библиотеки (файл пропал или поврежден) тоже можно удалить из списка
+        libraries = {(lib['name'] if lib['attached'] else f"{lib['name']} (не подключена)"): lib['name']
+                     for lib in self.db_manager.get_libraries()
+                     if lib['name'] != self.db_manager.main_library}
+        if not libraries:
+            QMessageBox.information(self, "Библиотеки", "Дополнительные библиотеки не подключены")
+            return
+
+        label, ok = QInputDialog.getItem(self, "Отключить библиотеку", "Библиотека:", list(libraries), 0, False)
+        if not ok:
+            return
+        name = libraries[label]
+
+        try:
+            self.db_manager.remove_library(name)
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось отключить библиотеку: {str(e)}")
+            return
+
+        self.load_genres()
+        self.refresh_data()
+        QMessageBox.information(self, "Успех", f"Библиотека \"{name}\" отключена!")
+
     def delete_selected_movie(self):
         selection = self.moviesTable.selectionModel().selectedRows()
         if not selection:
@@ -203,7 +327,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             )
 
             if reply == QMessageBox.StandardButton.Yes:
-                if self.db_manager.delete_movie(movie['id']):
+                if self.db_manager.delete_movie(movie['id'], movie.get('library')):
                     self.refresh_data()
                     QMessageBox.information(self, "Успех", "Фильм удален!")
 
@@ -219,7 +343,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             return
 
         movie = self.movies_model.get_movie(selection[0].row())
-        if movie and self.db_manager.update_movie(movie['id'], is_watched=watched):
+        if movie and self.db_manager.update_movie(movie['id'], movie.get('library'), is_watched=watched):
             self.refresh_data()
             status = "просмотренным" if watched else "непросмотренным"
             QMessageBox.information(self, "Успех", f"Фильм отмечен как {status}!")
@@ -242,7 +366,40 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if index == 1:
             self.update_statistics()
 
+    def run_maintenance(self):
+        # запускает обслуживание базы в фоновом потоке
+        if self.maintenance_worker and self.maintenance_worker.isRunning():
+            return
+        # открытый диалог - пользователь не бездействует
+        if QApplication.activeModalWidget() is not None:
+            self.maintenance_timer.start()
+            return
+        db_paths = [lib['path'] for lib in self.db_manager.get_libraries() if lib['attached']]
+        self.maintenance_worker = MaintenanceWorker(db_paths, self)
+        self.maintenance_worker.completed.connect(self.on_maintenance_completed)
+        self.maintenance_worker.failed.connect(self.on_maintenance_failed)
+        self.maintenance_worker.start()
+
+    def on_maintenance_completed(self, results):
+        total_ms = sum(r['duration_ms'] for r in results)
+        reclaimed = sum(r['bytes_reclaimed'] for r in results)
+        self.statusbar.showMessage(
+            f"Обслуживание базы выполнено за {total_ms:.0f} мс, освобождено {reclaimed // 1024} КБ"
+        )
+
+    def on_maintenance_failed(self, error):
+        print(f"Ошибка обслуживания: {error}")
+
+    def eventFilter(self, obj, event):
+        if event.type() in USER_INPUT_EVENTS:
+            self.maintenance_timer.start()
+        return super().eventFilter(obj, event)
+
     def closeEvent(self, event):
-        # закрытие соединения с базой данных, при завершении приложения
+        # дожидается завершения обслуживания и закрывает соединение с базой данных
+        QApplication.instance().removeEventFilter(self)
+        self.maintenance_timer.stop()
+        if self.maintenance_worker:
+            self.maintenance_worker.wait()
         self.db_manager.close()
         event.accept()
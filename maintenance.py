@@ -0,0 +1,227 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+
+class MaintenanceError(Exception):
+    pass
+
+
+class MaintenanceManager:
+    def __init__(self, db_path="movies.db", backup_dir=None, backup_pages=64,
+                 backup_pause=0.01, vacuum_pages=128, vacuum_max_steps=64, keep_backups=5):
+        self.db_path = db_path
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+        self.backup_pages = backup_pages  # страниц за один шаг резервного копирования
+        self.backup_pause = backup_pause  # пауза между шагами, чтобы не блокировать интерфейс
+        self.vacuum_pages = vacuum_pages  # страниц за один шаг incremental_vacuum
+        self.vacuum_max_steps = vacuum_max_steps  # ограничение на кол-во шагов за запуск
+        self.keep_backups = keep_backups
+        self.connection = None
+
+    def connect(self):
+        # отдельное соединение, чтобы обслуживание можно было запускать в фоновом потоке
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.db_path, timeout=10)
+            self.connection.row_factory = sqlite3.Row
+            self._create_log_table()
+        return self.connection
+
+    def _create_log_table(self):
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                duration_ms REAL NOT NULL,
+                bytes_reclaimed INTEGER DEFAULT 0,
+                details TEXT
+            )
+        ''')
+        self.connection.commit()
+
+    def _pragma(self, name):
+        return self.connect().execute(f"PRAGMA {name}").fetchone()[0]
+
+    def _database_size(self):
+        return self._pragma('page_count') * self._pragma('page_size')
+
+    def _log(self, task, started_at, duration_ms, bytes_reclaimed=0, details=None):
+        conn = self.connect()
+        conn.execute('''
+            INSERT INTO maintenance_log (task, started_at, duration_ms, bytes_reclaimed, details)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (task, started_at, duration_ms, bytes_reclaimed, details))
+        conn.commit()
+        return {
+            'task': task,
+            'started_at': started_at,
+            'duration_ms': duration_ms,
+            'bytes_reclaimed': bytes_reclaimed,
+            'details': details
+        }
+
+    def _run_task(self, task, func):
+        # замеряет время выполнения задачи и записывает результат в журнал
+        started_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        start = time.perf_counter()
+        bytes_reclaimed, details = func()
+        duration_ms = (time.perf_counter() - start) * 1000
+        return self._log(task, started_at, duration_ms, bytes_reclaimed, details)
+
+    def backup(self):
+        return self._run_task('backup', self._backup)
+
+    def _backup(self):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(self.db_path))[0]
+        target_path = os.path.join(self.backup_dir, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.db")
+
+        def progress(status, remaining, total):
+            # уступает время другим потокам между шагами копирования
+            if remaining and self.backup_pause:
+                time.sleep(self.backup_pause)
+
+        target = sqlite3.connect(target_path)
+        try:
+            self.connect().backup(target, pages=self.backup_pages, progress=progress)
+        finally:
+            target.close()
+
+        self._remove_old_backups(name)
+        return 0, target_path
+
+    def _remove_old_backups(self, name):
+        # оставляет только последние keep_backups копий этой базы; имя проверяется целиком,
+        # чтобы копии home.db не смешивались с копиями home_archive.db из той же папки
+        pattern = re.compile(rf"{re.escape(name)}_(\d{{8}}_\d{{6}})\.db")
+        backups = []
+        for f in os.listdir(self.backup_dir):
+            match = pattern.fullmatch(f)
+            if match:
+                backups.append((match.group(1), f))
+        backups = [f for _, f in sorted(backups)]
+        for old in backups[:-self.keep_backups] if self.keep_backups else []:
+            try:
+                os.remove(os.path.join(self.backup_dir, old))
+            except OSError:
+                pass
+
+    def incremental_vacuum(self):
+        return self._run_task('incremental_vacuum', self._incremental_vacuum)
+
+    def needs_conversion(self):
+        # база создана без auto_vacuum=INCREMENTAL
+        return self._pragma('auto_vacuum') != 2
+
+    def convert(self):
+        return self._run_task('convert', self._convert)
+
+    def _convert(self):
+        # auto_vacuum нельзя включить у существующей базы без полного VACUUM;
+        # VACUUM блокирует базу целиком, поэтому запускается только явно (--convert)
+        conn = self.connect()
+        size_before = self._database_size()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return max(0, size_before - self._database_size()), "auto_vacuum=INCREMENTAL, выполнен VACUUM"
+
+    def _incremental_vacuum(self):
+        conn = self.connect()
+        size_before = self._database_size()
+
+        if self.needs_conversion():
+            return 0, "auto_vacuum не включен, выполните maintenance.py --convert"
+
+        free_before = self._pragma('freelist_count')
+        steps = 0
+        while steps < self.vacuum_max_steps and self._pragma('freelist_count') > 0:
+            # execute() выполняет только один шаг прагмы (одну страницу),
+            # executescript() доводит ее до конца и освобождает vacuum_pages страниц
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+            steps += 1
+
+        free_after = self._pragma('freelist_count')
+        details = (f"шагов: {steps}, освобождено страниц: {free_before - free_after}, "
+                   f"свободных страниц осталось: {free_after}")
+        return max(0, size_before - self._database_size()), details
+
+    def optimize(self):
+        return self._run_task('optimize', self._optimize)
+
+    def _optimize(self):
+        self.connect().execute("PRAGMA optimize")
+        return 0, None
+
+    def integrity_check(self):
+        return self._run_task('integrity_check', self._integrity_check)
+
+    def _integrity_check(self):
+        rows = self.connect().execute("PRAGMA integrity_check").fetchall()
+        return 0, "; ".join(row[0] for row in rows)
+
+    def run(self, backup=True):
+        # выполняет полный цикл обслуживания; поврежденная база не копируется и не изменяется,
+        # иначе ротация постепенно заменила бы все исправные копии поврежденными
+        check = self.integrity_check()
+        if check['details'] != 'ok':
+            raise MaintenanceError(f"Проверка целостности не пройдена: {check['details']}")
+
+        results = [check]
+        if backup:
+            results.append(self.backup())
+        results.append(self.incremental_vacuum())
+        results.append(self.optimize())
+        return results
+
+    def get_log(self, limit=20):
+        cursor = self.connect().execute(
+            "SELECT * FROM maintenance_log ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных фильмов")
+    parser.add_argument('--db', default="movies.db", help="путь к базе данных")
+    parser.add_argument('--backup-dir', default=None, help="папка для резервных копий")
+    parser.add_argument('--no-backup', action='store_true', help="не создавать резервную копию")
+    parser.add_argument('--log', action='store_true', help="показать журнал обслуживания")
+    parser.add_argument('--convert', action='store_true',
+                        help="включить auto_vacuum=INCREMENTAL (полный VACUUM, закройте приложение)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"✖ База данных не найдена: {args.db}")
+        return 1
+
+    manager = MaintenanceManager(args.db, backup_dir=args.backup_dir)
+    try:
+        if args.log:
+            results = manager.get_log()
+        elif args.convert:
+            results = [manager.convert()]
+        else:
+            results = manager.run(backup=not args.no_backup)
+        for result in results:
+            print(f"✓ {result['task']}: {result['duration_ms']:.1f} мс, "
+                  f"освобождено {result['bytes_reclaimed']} байт"
+                  + (f" ({result['details']})" if result['details'] else ""))
+    except (sqlite3.Error, MaintenanceError) as e:
+        print(f"✖ Ошибка обслуживания: {e}")
+        return 1
+    finally:
+        manager.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -6,7 +6,7 @@ class MoviesTableModel(QAbstractTableModel):
     def __init__(self, movies=None):
         super().__init__()
         self.movies = movies or []
-        self.headers = ['Название', 'Год', 'Жанр', 'Режиссер', 'Рейтинг', 'Просмотрено']
+        self.headers = ['Название', 'Год', 'Жанр', 'Режиссер', 'Рейтинг', 'Просмотрено', 'Библиотека']
 
     def rowCount(self, parent=None):
         # возвращает кол-во строк в модели
@@ -38,6 +38,8 @@ class MoviesTableModel(QAbstractTableModel):
                 return f"{rating:.1f}" if rating else "-"
             elif column == 5:
                 return "✓" if movie.get('is_watched') else "✖"
+            elif column == 6:
+                return movie.get('library', '')
 
         # выравнивание текста
         elif role == Qt.ItemDataRole.TextAlignmentRole:
@@ -1,7 +1,7 @@
 import os
 from datetime import datetime
-from PyQt6.QtWidgets import QDialog, QMessageBox, QFileDialog
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QDialog, QMessageBox, QFileDialog, QCompleter
+from PyQt6.QtCore import Qt, QStringListModel
 from PyQt6.QtGui import QPixmap
 from PyQt6.uic import loadUiType
 
@@ -10,24 +10,60 @@ Ui_MovieDialog, _ = loadUiType(UI_PATH)
 
 
 class MovieDialog(QDialog, Ui_MovieDialog):
-    def __init__(self, db_manager, parent=None, movie_data=None):
+    def __init__(self, db_manager, parent=None, movie_data=None, library=None):
         super().__init__(parent)
         self.db_manager = db_manager
-        self.movie_data = movie_data
-        self.is_edit_mode = movie_data is not None
+        self.movie_data = None
+        self.is_edit_mode = False
         self.poster_path = None
+        self.genres = None  # список жанров, загруженный в genreCombo
+        self.genre_indexes = {}  # ID жанра -> индекс в genreCombo
+        self.directors = None
+        self.library_names = None  # библиотеки, загруженные в libraryCombo
 
         self.setupUi(self)
 
         self.yearSpin.setRange(1900,2025)
 
+        # автодополнение режиссера по уже известным именам
+        self.directors_model = QStringListModel(self)
+        self.director_completer = QCompleter(self.directors_model, self)
+        self.director_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.directorEdit.setCompleter(self.director_completer)
+
         self.setup_connections()
+        self.reset(movie_data, library)
+
+    def reset(self, movie_data=None, library=None):
+        # подготавливает диалог к повторному использованию без пересоздания интерфейса
+        self.movie_data = movie_data
+        self.is_edit_mode = movie_data is not None
+        self.poster_path = None
+
+        self.titleEdit.clear()
+        self.yearSpin.setValue(self.yearSpin.minimum())
+        self.directorEdit.clear()
+        self.ratingSpin.setValue(0)
+        self.descriptionEdit.clear()
+        self.watchedCheck.setChecked(False)
+        self.posterImageLabel.clear()
+        self.posterImageLabel.setText("Постер")
+
         self.load_genres()
+        self.load_directors()
+        self.genreCombo.setCurrentIndex(0)
+        # при редактировании фильм остается в своей библиотеке
+        self.load_libraries(movie_data.get('library') if movie_data else library)
+        self.libraryCombo.setEnabled(not self.is_edit_mode)
 
         if self.is_edit_mode:
             self.load_movie_data()
             self.setWindowTitle("Редактирование фильма")
             self.titleLabel.setText("Редактирование фильма")
+        else:
+            self.setWindowTitle("Добавление фильма")
+            self.titleLabel.setText("Добавление нового фильма")
+        self.titleEdit.setFocus()
 
     def setup_connections(self):
         self.buttonBox.accepted.connect(self.save_movie)
@@ -35,13 +71,41 @@ class MovieDialog(QDialog, Ui_MovieDialog):
         self.loadPosterBtn.clicked.connect(self.load_poster)
 
     def load_genres(self):
-        # загружает список жанров из базы данных, добавляя их в список
+        # загружает список жанров из кэша, список пересобирается только при изменении
         genres = self.db_manager.get_genres()
+        if genres is self.genres:
+            return
+        self.genres = genres
         self.genreCombo.clear()
         self.genreCombo.addItem("Не выбран", 0)
+        self.genre_indexes = {}
         for genre in genres:
+            self.genre_indexes[genre['id']] = self.genreCombo.count()
             self.genreCombo.addItem(genre['name'], genre['id'])
 
+    def load_libraries(self, current=None):
+        # список берется из подключенных библиотек в памяти и пересобирается только при изменении
+        names = tuple(self.db_manager.libraries)
+        if names != self.library_names:
+            self.library_names = names
+            self.libraryCombo.clear()
+            for name in names:
+                self.libraryCombo.addItem(name, name)
+
+            # список библиотек виден, только если их несколько
+            has_choice = len(names) > 1
+            self.libraryLabel.setVisible(has_choice)
+            self.libraryCombo.setVisible(has_choice)
+
+        index = self.libraryCombo.findData(current)
+        self.libraryCombo.setCurrentIndex(max(index, 0))
+
+    def load_directors(self):
+        directors = self.db_manager.get_directors()
+        if directors is not self.directors:
+            self.directors = directors
+            self.directors_model.setStringList(directors)
+
     def load_movie_data(self):
         if self.movie_data:
             # заполнение текстовых и числовых полей
@@ -54,11 +118,8 @@ class MovieDialog(QDialog, Ui_MovieDialog):
 
             # установка выбранного жанра
             genre_id = self.movie_data.get('genre_id')
-            if genre_id:
-                for i in range(self.genreCombo.count()):
-                    if self.genreCombo.itemData(i) == genre_id:
-                        self.genreCombo.setCurrentIndex(i)
-                        break
+            if genre_id in self.genre_indexes:
+                self.genreCombo.setCurrentIndex(self.genre_indexes[genre_id])
             # если указан путь и сущ-ет файл, загружаем постер
             poster_path = self.movie_data.get('poster_path')
             if poster_path and os.path.exists(poster_path):
@@ -97,12 +158,14 @@ class MovieDialog(QDialog, Ui_MovieDialog):
         rating = self.ratingSpin.value() or None
         description = self.descriptionEdit.toPlainText().strip() or None
         is_watched = self.watchedCheck.isChecked()
+        library = self.libraryCombo.currentData()
 
         try:
             if self.is_edit_mode:
                 # режим редактирования
                 success = self.db_manager.update_movie(
                     self.movie_data['id'],
+                    self.movie_data.get('library'),
                     title=title,
                     year=year,
                     genre_id=genre_id,
@@ -121,12 +184,13 @@ class MovieDialog(QDialog, Ui_MovieDialog):
                     director=director,
                     rating=rating,
                     description=description,
-                    poster_path=self.poster_path
+                    poster_path=self.poster_path,
+                    library=library
                 )
                 success = movie_id is not None
 
                 if success and is_watched:
-                    self.db_manager.update_movie(movie_id, is_watched=True)
+                    self.db_manager.update_movie(movie_id, library, is_watched=True)
             # закрывает диалог, при успешном сохранении
             if success:
                 self.accept()